@@ -66,6 +66,18 @@ def camel_case_translate(f):
 
 class RiskKey(namedtuple('RiskKey', ('provider', 'date', 'market', 'params', 'scenario', 'risk_measure'))):
 
+    def __hash__(self) -> int:
+        # Risk keys are looked up repeatedly in the pricing cache and pending calcs, so only hash the fields once
+        try:
+            return self.__calced_hash
+        except AttributeError:
+            self.__calced_hash = super().__hash__()
+            return self.__calced_hash
+
+    def __getstate__(self):
+        # Hashes are not stable across processes, so do not pickle the cached value
+        return None
+
     @property
     def base(self):
         return RiskKey(self.provider, None, None, self.params, self.scenario, self.risk_measure)
@@ -90,6 +90,8 @@ class ContextMeta(type):
 
 class ContextBase(metaclass=ContextMeta):
 
+    __slots__ = ()
+
     def __enter__(self):
         self._cls.push(self)
         setattr(thread_local, self.__entered_key, True)
@@ -141,6 +143,8 @@ class ContextBase(metaclass=ContextMeta):
 
 class ContextBaseWithDefault(ContextBase):
 
+    __slots__ = ()
+
     @classmethod
     def default_value(cls) -> object:
         return cls()
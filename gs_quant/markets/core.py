@@ -15,17 +15,21 @@ under the License.
 """
 import datetime as dt
 import logging
+import os
 import weakref
 from abc import ABCMeta
-from concurrent.futures import ThreadPoolExecutor
+from collections import defaultdict
+from concurrent.futures import ALL_COMPLETED, Future, ThreadPoolExecutor, wait
+from contextvars import ContextVar
+from functools import lru_cache
 from inspect import signature
-from threading import Lock
-from typing import Iterable, Optional, Union
+from threading import Lock, local
+from typing import Iterable, Optional, Tuple, Union
 
 from .markets import CloseMarket, LiveMarket, Market
 from gs_quant.base import Priceable, RiskKey, Scenario, get_enum_value
 from gs_quant.common import PricingLocation
-from gs_quant.context_base import ContextBaseWithDefault
+from gs_quant.context_base import ContextBaseWithDefault, nullcontext
 from gs_quant.datetime.date import business_day_offset
 from gs_quant.risk import CompositeScenario, DataFrameWithInfo, ErrorValue, FloatWithInfo, MarketDataScenario, \
     RiskMeasure, StringWithInfo
@@ -39,6 +43,25 @@ _logger = logging.getLogger(__name__)
 
 CacheResult = Union[DataFrameWithInfo, FloatWithInfo, StringWithInfo]
 
+# Shared across contexts and kept for the life of the process, to avoid creating threads on every calc.
+# Requests are I/O bound, so allow some concurrency even on small machines, but bound it to avoid oversubscription
+REQUEST_POOL_MAX_WORKERS = min(32, max(4, (os.cpu_count() or 1) * 2))
+_request_pool = ThreadPoolExecutor(max_workers=REQUEST_POOL_MAX_WORKERS, thread_name_prefix='pricing-requests')
+_request_pool_thread = local()
+
+
+def _submit_request(fn, *args) -> Future:
+    def run():
+        # Left set for the life of the thread, as done callbacks run on it after fn returns
+        _request_pool_thread.active = True
+        return fn(*args)
+
+    return _request_pool.submit(run)
+
+
+# The outermost entered PricingContext, which collects all calcs made under it
+_active_context = ContextVar('_active_pricing_context', default=None)
+
 
 class PricingCache(metaclass=ABCMeta):
     """
@@ -48,16 +71,35 @@ class PricingCache(metaclass=ABCMeta):
 
     @classmethod
     def clear(cls):
-        __cache = weakref.WeakKeyDictionary()
+        cls.__cache = weakref.WeakKeyDictionary()
 
     @classmethod
     def get(cls, risk_key: RiskKey, priceable: Priceable) -> Optional[CacheResult]:
-        return cls.__cache.get(priceable, {}).get(risk_key)
+        results = cls.__cache.get(priceable)
+        return None if results is None else results.get(risk_key)
 
     @classmethod
     def put(cls, risk_key: RiskKey, priceable: Priceable, result: CacheResult):
         if not isinstance(result, ErrorValue) and not isinstance(risk_key.market, LiveMarket):
-            cls.__cache.setdefault(priceable, {})[risk_key] = result
+            results = cls.__cache.get(priceable)
+            if results is None:
+                cls.__cache[priceable] = results = {}
+
+            results[risk_key] = result
+
+    @classmethod
+    def put_many(cls, items: Iterable[Tuple[RiskKey, Priceable, CacheResult]]):
+        results_by_priceable = defaultdict(dict)
+        for risk_key, priceable, result in items:
+            if not isinstance(result, ErrorValue) and not isinstance(risk_key.market, LiveMarket):
+                results_by_priceable[priceable][risk_key] = result
+
+        for priceable, results in results_by_priceable.items():
+            cached = cls.__cache.get(priceable)
+            if cached is None:
+                cls.__cache[priceable] = results
+            else:
+                cached.update(results)
 
     @classmethod
     def drop(cls, priceable: Priceable):
@@ -71,6 +113,10 @@ class PricingContext(ContextBaseWithDefault):
     A context for controlling pricing and market data behaviour
     """
 
+    __slots__ = ('_pricing_date', '_csa_term', '_is_async', '_is_batch', '_batch_results_timeout', '_use_cache',
+                 '_visible_to_gs', '_market_data_location', '_market', '_lock', '_pending', '_parameters_cached',
+                 '_scenario_cached')
+
     def __init__(self,
                  pricing_date: Optional[dt.date] = None,
                  market_data_location: Optional[Union[PricingLocation, str]] = None,
@@ -124,17 +170,34 @@ class PricingContext(ContextBaseWithDefault):
         """
         super().__init__()
 
-        self.__pricing_date = pricing_date or business_day_offset(dt.date.today(), 0, roll='preceding')
-        self.__csa_term = csa_term
-        self.__is_async = is_async
-        self.__is_batch = is_batch
-        self.__batch_results_timeout = batch_results_timeout
-        self.__use_cache = use_cache
-        self.__visible_to_gs = visible_to_gs
-        self.__market_data_location = get_enum_value(PricingLocation, market_data_location)
-        self.__market = market or CloseMarket()
-        self.__lock = Lock()
-        self.__pending = {}
+        self._pricing_date = pricing_date or business_day_offset(dt.date.today(), 0, roll='preceding')
+        self._csa_term = csa_term
+        self._is_async = is_async
+        self._is_batch = is_batch
+        self._batch_results_timeout = batch_results_timeout
+        self._use_cache = use_cache
+        self._visible_to_gs = visible_to_gs
+        self._market_data_location = get_enum_value(PricingLocation, market_data_location)
+        self._market = market or CloseMarket()
+        self._lock = Lock()
+        self._pending = {}
+        self._parameters_cached = None
+        self._scenario_cached = None
+
+    def __enter__(self):
+        # No state is kept on the instance, as the same context may be entered on several threads at once
+        ret = super().__enter__()
+        if _active_context.get() is None:
+            _active_context.set(self)
+
+        return ret
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        try:
+            super().__exit__(exc_type, exc_val, exc_tb)
+        finally:
+            if _active_context.get() is self:
+                _active_context.set(None)
 
     def _on_exit(self, exc_type, exc_val, exc_tb):
         if exc_val:
@@ -143,96 +206,195 @@ class PricingContext(ContextBaseWithDefault):
             self.__calc()
 
     def __calc(self):
+        with self._lock:
+            if not self._pending:
+                # Everything was satisfied from the cache (or there was nothing to do)
+                return
+
+            pending = tuple(self._pending.items())
+            self._pending = {}
+
         session = GsSession.current
-        requests_by_provider = {}
 
-        def run_requests(requests_: Iterable[RiskRequest], provider_):
-            results = {}
+        def handle_results(results: Iterable[dict], futures: dict):
+            futures_and_values = []
+            to_cache = []
+            for result in results:
+                for (risk_key, result_priceable), value in result.items():
+                    if self._use_cache:
+                        to_cache.append((risk_key, result_priceable, value))
 
-            try:
-                with session:
-                    results = provider_.calc_multi(requests_)
-                    if self.__is_batch:
-                        results = provider_.get_results(dict(zip(results, requests_)),
-                                                        timeout=self.__batch_results_timeout).values()
-            except Exception as e:
-                results = ({k: e for k in self.__pending.keys()},)
-            finally:
-                with self.__lock:
-                    for result in results:
-                        for (risk_key, result_priceable), value in result.items():
-                            if self.__use_cache:
-                                PricingCache.put(risk_key, result_priceable, value)
-
-                            self.__pending.pop((risk_key, result_priceable)).set_result(value)
-
-        with self.__lock:
-            # Group requests optimally
-            for (key, priceable) in self.__pending.keys():
-                requests_by_provider.setdefault(key.provider, {})\
-                    .setdefault((key.params, key.scenario, key.date, key.market), {})\
-                    .setdefault(priceable, set())\
-                    .add(key.risk_measure)
+                    future = futures.pop((risk_key, result_priceable), None)
+                    if future is not None:
+                        futures_and_values.append((future, value))
 
-        if requests_by_provider:
-            num_providers = len(requests_by_provider)
-            request_pool = ThreadPoolExecutor(num_providers) if num_providers > 1 or self.__is_async else None
+            if to_cache:
+                PricingCache.put_many(to_cache)
+
+            # Setting results runs any done callbacks, so only do so once the bookkeeping above is complete
+            for future, value in futures_and_values:
+                future.set_result(value)
+
+        def handle_error(e: Exception, futures: dict):
+            handle_results(({k: e for k in tuple(futures.keys())},), futures)
 
-            for provider, by_params_scenario_date_market in requests_by_provider.items():
-                requests_for_provider = {}
+        def session_context():
+            # Only skip entering the session if it is already current on this thread and initialised, as entering is
+            # what lazily initialises it
+            is_active = session._session is not None and GsSession.current_is_set and GsSession.current is session
+            return nullcontext() if is_active else session
 
-                for (params, scenario, date, market), positions_by_measures in by_params_scenario_date_market.items():
-                    for priceable, risk_measures in positions_by_measures.items():
-                        requests_for_provider.setdefault((params, scenario, date, market, tuple(sorted(risk_measures))),
-                                                         []).append(priceable)
+        def calc_requests(requests_: Tuple[RiskRequest, ...], provider_):
+            with session_context():
+                return provider_.calc_multi(requests_)
 
-                # TODO This will optimise for the fewest requests but we might want to just send one request per date
-                requests_by_date_market = {}
-                for (params, scenario, date, market, risk_measures), priceables in requests_for_provider.items():
-                    requests_by_date_market.setdefault((params, scenario, risk_measures, tuple(priceables)), set())\
-                        .add((date, market))
+        def get_results(requests_: Tuple[RiskRequest, ...], provider_, ids):
+            if len(ids) != len(requests_):
+                raise RuntimeError('Missing results')
+
+            with session_context():
+                return provider_.get_results(dict(zip(ids, requests_)), timeout=self._batch_results_timeout).values()
+
+        def run_requests(requests_: Iterable[RiskRequest], provider_, futures: dict):
+            requests_ = tuple(requests_)
+
+            try:
+                results = calc_requests(requests_, provider_)
+                if self._is_batch:
+                    results = get_results(requests_, provider_, results)
+            except Exception as e:
+                handle_error(e, futures)
+            else:
+                handle_results(results, futures)
+
+        def submit_requests(requests_: Iterable[RiskRequest], provider_, futures: dict) -> Future:
+            # Chain submission and (for batch) result polling as separate pool tasks, so that one provider's
+            # polling does not hold up another provider's submission
+            requests_ = tuple(requests_)
+            done = Future()
+
+            def on_results(results_future: Future):
+                try:
+                    handle_results(results_future.result(), futures)
+                except Exception as e:
+                    handle_error(e, futures)
+                finally:
+                    done.set_result(None)
+
+            def on_calc(calc_future: Future):
+                if self._is_batch and calc_future.exception() is None:
+                    try:
+                        _submit_request(get_results, requests_, provider_, calc_future.result())\
+                            .add_done_callback(on_results)
+                    except Exception as e:
+                        handle_error(e, futures)
+                        done.set_result(None)
+                else:
+                    on_results(calc_future)
+
+            _submit_request(calc_requests, requests_, provider_).add_done_callback(on_calc)
+            return done
+
+        # Group requests optimally, keeping each provider's futures apart so that its results (or failure) only
+        # touch its own calcs
+        futures_by_provider = defaultdict(dict)
+        measures_by_position = defaultdict(lambda: defaultdict(set))
+        for (key, priceable), future in pending:
+            futures_by_provider[key.provider][(key, priceable)] = future
+            measures_by_position[(key.provider, key.params, key.scenario, key.date, key.market)][priceable]\
+                .add(key.risk_measure)
+
+        # TODO This will optimise for the fewest requests but we might want to just send one request per date
+        requests_by_provider = defaultdict(lambda: defaultdict(set))
+        for (provider, params, scenario, date, market), measures_by_priceable in measures_by_position.items():
+            priceables_by_measures = defaultdict(list)
+            for priceable, risk_measures in measures_by_priceable.items():
+                priceables_by_measures[frozenset(risk_measures)].append(priceable)
+
+            for risk_measures, priceables in priceables_by_measures.items():
+                requests_by_provider[provider][(params, scenario, risk_measures, tuple(priceables))].add((date, market))
+
+        if requests_by_provider:
+            # A synchronous calc made from one of the pool's own threads (e.g. from a result callback) must not block
+            # waiting on tasks queued behind it, so run such requests inline
+            on_pool_thread = getattr(_request_pool_thread, 'active', False)
+            use_pool = self._is_async or (len(requests_by_provider) > 1 and not on_pool_thread)
+            request_futures = []
+            quantities = {}
+            positions_by_priceables = {}
+            sorted_measures = {}
+
+            for provider, requests_by_date_market in requests_by_provider.items():
+                # The same priceables may appear under several measure sets, so only build their positions once
+                for (_, _, _, priceables) in requests_by_date_market.keys():
+                    if priceables not in positions_by_priceables:
+                        for p in priceables:
+                            if p not in quantities:
+                                quantities[p] = p.get_quantity()
+
+                        positions_by_priceables[priceables] = tuple(RiskPosition(instrument=p, quantity=quantities[p])
+                                                                    for p in priceables)
+
+                # Requests carry the measures in a deterministic order
+                for (_, _, risk_measures, _) in requests_by_date_market.keys():
+                    if risk_measures not in sorted_measures:
+                        sorted_measures[risk_measures] = tuple(sorted(risk_measures))
 
                 requests = [
                     RiskRequest(
-                        tuple(RiskPosition(instrument=p, quantity=p.get_quantity()) for p in priceables),
-                        risk_measures,
+                        positions_by_priceables[priceables],
+                        sorted_measures[risk_measures],
                         parameters=self.__parameters,
-                        wait_for_results=not self.__is_batch,
+                        wait_for_results=not self._is_batch,
                         scenario=scenario,
                         pricing_and_market_data_as_of=tuple(PricingDateAndMarketDataAsOf(pricing_date=d, market=m)
-                                                            for d, m in sorted(dates_markets)),
-                        request_visible_to_gs=self.__visible_to_gs
+                                                            for d, m in (sorted(dates_markets)
+                                                                         if len(dates_markets) > 1 else dates_markets)),
+                        request_visible_to_gs=self._visible_to_gs
                     )
                     for (params, scenario, risk_measures, priceables), dates_markets in requests_by_date_market.items()
                 ]
 
-                if request_pool:
-                    request_pool.submit(run_requests, requests, provider)
+                if use_pool:
+                    request_futures.append(submit_requests(requests, provider, futures_by_provider[provider]))
                 else:
-                    run_requests(requests, provider)
+                    run_requests(requests, provider, futures_by_provider[provider])
 
-            if request_pool:
-                request_pool.shutdown(wait=not self.__is_async)
+            if request_futures and not self._is_async:
+                wait(request_futures, return_when=ALL_COMPLETED)
 
     def __risk_key(self, risk_measure: RiskMeasure, provider: type) -> RiskKey:
-        return RiskKey(provider, self.__pricing_date, self.__market, self.__parameters, self.__scenario, risk_measure)
+        return RiskKey(provider, self._pricing_date, self._market, self.__parameters, self.__scenario, risk_measure)
 
     @property
     def __parameters(self) -> RiskRequestParameters:
-        return RiskRequestParameters(csa_term=self.__csa_term, raw_results=True)
+        if self._parameters_cached is None:
+            self._parameters_cached = RiskRequestParameters(csa_term=self._csa_term, raw_results=True)
+
+        return self._parameters_cached
 
     @property
     def __scenario(self) -> Optional[MarketDataScenario]:
+        # Entering or exiting a scenario replaces the path tuple, so its identity tells us whether to rebuild.
+        # Holding a reference to the path means its id cannot be reused while cached. The path and scenario are
+        # stored as a single tuple, so that threads with different scenario stacks cannot mix up each other's results
         scenarios = Scenario.path
+        scenario_cached = self._scenario_cached
+        if scenario_cached is not None and scenario_cached[0] is scenarios:
+            return scenario_cached[1]
+
         if not scenarios:
-            return None
+            scenario = None
+        else:
+            scenario = MarketDataScenario(scenario=scenarios[0] if len(scenarios) == 1 else
+                                          CompositeScenario(scenarios=tuple(reversed(scenarios))))
 
-        return MarketDataScenario(scenario=scenarios[0] if len(scenarios) == 1 else
-                                  CompositeScenario(scenarios=tuple(reversed(scenarios))))
+        self._scenario_cached = (scenarios, scenario)
+        return scenario
 
     @property
     def active_context(self):
-        return next((c for c in reversed(PricingContext.path) if c.is_entered), self)
+        return _active_context.get() or self
 
     @property
     def is_current(self) -> bool:
@@ -240,23 +402,23 @@ class PricingContext(ContextBaseWithDefault):
 
     @property
     def is_async(self) -> bool:
-        return self.__is_async
+        return self._is_async
 
     @property
     def is_batch(self) -> bool:
-        return self.__is_batch
+        return self._is_batch
 
     @property
     def batch_results_timeout(self) -> Optional[int]:
-        return self.__batch_results_timeout
+        return self._batch_results_timeout
 
     @property
     def market(self) -> Market:
-        return self.__market
+        return self._market
 
     @property
     def market_data_location(self) -> PricingLocation:
-        return self.__market_data_location
+        return self._market_data_location
 
     @property
     def csa_term(self) -> str:
@@ -265,20 +427,26 @@ class PricingContext(ContextBaseWithDefault):
     @property
     def pricing_date(self) -> dt.date:
         """Pricing date"""
-        return self.__pricing_date
+        return self._pricing_date
 
     @property
     def use_cache(self) -> bool:
         """Cache results"""
-        return self.__use_cache
+        return self._use_cache
 
     @property
     def visible_to_gs(self) -> bool:
         """Request contents visible to GS"""
-        return self.__visible_to_gs
+        return self._visible_to_gs
+
+    @classmethod
+    @lru_cache()
+    def _init_param_names(cls) -> Tuple[str, ...]:
+        # Skip self, as __init__ is unbound here
+        return tuple(signature(cls.__init__).parameters.keys())[1:]
 
     def clone(self, **kwargs):
-        clone_kwargs = {k: getattr(self, k, None) for k in signature(self.__init__).parameters.keys()}
+        clone_kwargs = {k: getattr(self, k, None) for k in self._init_param_names()}
         clone_kwargs.update(kwargs)
         return self.__class__(**clone_kwargs)
 
@@ -298,18 +466,21 @@ class PricingContext(ContextBaseWithDefault):
         >>> swap = IRSwap('Pay', '10y', 'USD', fixed_rate=0.01)
         >>> delta = swap.calc(IRDelta)
         """
-        with self.active_context.__lock:
-            risk_key = self.__risk_key(risk_measure, priceable.provider())
-            future = self.active_context.__pending.get((risk_key, priceable))
-
+        active_context = self.active_context
+        risk_key = self.__risk_key(risk_measure, priceable.provider())
+        cached_result = PricingCache.get(risk_key, priceable) if self.use_cache else None
+
+        if cached_result is not None:
+            # Nothing to calculate, so skip the pending map and __calc altogether
+            return PricingFuture(cached_result)
+
+        # __calc swaps out the pending map under the same lock, so a calc cannot land in a map that has been detached.
+        # Cache hits above never take the lock
+        with active_context._lock:
+            pending = active_context._pending
+            future = pending.get((risk_key, priceable))
             if future is None:
-                future = PricingFuture()
-                cached_result = PricingCache.get(risk_key, priceable) if self.use_cache else None
-
-                if cached_result is not None:
-                    future.set_result(cached_result)
-                else:
-                    self.active_context.__pending[(risk_key, priceable)] = future
+                future = pending[(risk_key, priceable)] = PricingFuture()
 
         if not (self.is_entered or self.is_async):
             self.__calc()
@@ -30,6 +30,8 @@ class HistoricalPricingContext(PricingContext):
     A context for producing valuations over multiple dates
     """
 
+    __slots__ = ('__date_range',)
+
     def __init__(
             self,
             start: Optional[Union[int, dt.date]] = None,
@@ -20,13 +20,15 @@ from concurrent.futures import Future
 from functools import partial
 from itertools import chain
 import pandas as pd
-from typing import Iterable, Mapping, Optional, Tuple, Union
+from typing import Any, Iterable, Mapping, Optional, Tuple, Union
 
 
 class PricingFuture(Future):
 
-    def __init__(self):
+    def __init__(self, result: Optional[Any] = None):
         super().__init__()
+        if result is not None:
+            self.set_result(result)
 
     def result(self, timeout=None):
         """Return the result of the call that the future represents.
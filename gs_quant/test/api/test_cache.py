@@ -117,6 +117,83 @@ def test_cache_addition_removal():
     assert not PricingCache.get(p2_price_key, p2)
 
 
+def test_cache_clear():
+    set_session()
+
+    p1 = IRSwap('Pay', '10y', 'DKK')
+
+    with mock.patch('gs_quant.api.gs.risk.GsRiskApi._exec') as mocker:
+        mocker.return_value = [[[[{'$type': 'Risk', 'val': 0.07}]]]]
+
+        with PricingContext(use_cache=True) as pc:
+            p1.price()
+            price_key = pc._PricingContext__risk_key(risk.Price, p1.provider())
+
+    assert PricingCache.get(price_key, p1)
+
+    PricingCache.clear()
+    assert PricingCache.get(price_key, p1) is None
+
+
+def test_cache_hit_skips_request():
+    set_session()
+
+    p1 = IRSwap('Pay', '10y', 'DKK')
+
+    with mock.patch('gs_quant.api.gs.risk.GsRiskApi._exec') as mocker:
+        mocker.return_value = [[[[{'$type': 'Risk', 'val': 0.07}]]]]
+
+        with PricingContext(use_cache=True):
+            price_f = p1.price()
+
+        with PricingContext(use_cache=True):
+            cached_price_f = p1.price()
+
+        assert mocker.call_count == 1
+
+    assert cached_price_f.result() == price_f.result()
+
+
+def test_cache_put_many():
+    set_session()
+
+    p1 = IRSwap('Pay', '10y', 'DKK')
+    p2 = IRSwap('Pay', '5y', 'DKK')
+
+    with PricingContext() as pc:
+        price_key = pc._PricingContext__risk_key(risk.Price, p1.provider())
+        delta_key = pc._PricingContext__risk_key(risk.IRDelta, p1.provider())
+
+    PricingCache.put_many((
+        (price_key, p1, 0.07),
+        (delta_key, p1, risk.ErrorValue(delta_key, 'error')),
+        (price_key, p2, 0.08)
+    ))
+
+    assert PricingCache.get(price_key, p1) == 0.07
+    assert PricingCache.get(delta_key, p1) is None
+    assert PricingCache.get(price_key, p2) == 0.08
+
+
+def test_risk_key_follows_scenario():
+    set_session()
+
+    p1 = IRSwap('Pay', '10y', 'DKK')
+
+    with PricingContext() as pc:
+        base_key = pc._PricingContext__risk_key(risk.Price, p1.provider())
+
+        with risk.CarryScenario(time_shift=30):
+            scenario_key = pc._PricingContext__risk_key(risk.Price, p1.provider())
+
+        exited_key = pc._PricingContext__risk_key(risk.Price, p1.provider())
+
+    assert base_key.scenario is None
+    assert scenario_key.scenario is not None
+    assert scenario_key != base_key
+    assert exited_key == base_key
+
+
 @mock.patch.object(GsRiskApi, '_exec')
 def test_cache_subset(mocker):
     set_session()
@@ -18,6 +18,8 @@ from unittest import mock
 
 import copy
 import datetime as dt
+import threading
+from concurrent.futures import ThreadPoolExecutor
 import pandas as pd
 
 import gs_quant.risk as risk
@@ -27,7 +29,8 @@ from gs_quant.common import AssetClass
 from gs_quant.instrument import CommodSwap, EqForward, EqOption, FXOption, IRBasisSwap, IRSwap, IRSwaption, IRCap,\
     IRFloor
 from gs_quant.markets import PricingContext
-from gs_quant.session import Environment, GsSession
+from gs_quant.markets.core import REQUEST_POOL_MAX_WORKERS, _submit_request
+from gs_quant.session import Environment, GsSession, OAuth2Session
 from gs_quant.target.risk import PricingDateAndMarketDataAsOf, RiskPosition, RiskRequestParameters
 
 priceables = (
@@ -43,6 +46,14 @@ priceables = (
 )
 
 
+class OtherRiskApi(GsRiskApi):
+    pass
+
+
+class OtherIRSwap(IRSwap):
+    PROVIDER = OtherRiskApi
+
+
 def set_session():
     from gs_quant.session import OAuth2Session
     OAuth2Session.init = mock.MagicMock(return_value=None)
@@ -195,6 +206,151 @@ def test_disjoint_priceables_measures(mocker):
     assert swaption_dollar_price_f.result() == 0.01
 
 
+def test_multiple_providers():
+    set_session()
+
+    swap = IRSwap('Pay', '10y', 'USD')
+    other_swap = OtherIRSwap('Pay', '10y', 'USD')
+
+    with mock.patch.object(GsRiskApi, '_exec') as mocker, mock.patch.object(OtherRiskApi, '_exec') as other_mocker:
+        mocker.return_value = [[[[{'$type': 'Risk', 'val': 0.01}]]]]
+        other_mocker.return_value = [[[[{'$type': 'Risk', 'val': 0.02}]]]]
+
+        with PricingContext():
+            price_f = swap.price()
+            other_price_f = other_swap.price()
+
+        assert price_f.done() and other_price_f.done()
+        assert mocker.call_count == 1
+        assert other_mocker.call_count == 1
+
+    assert price_f.result() == 0.01
+    assert other_price_f.result() == 0.02
+
+
+def test_multiple_providers_batch():
+    set_session()
+
+    swap = IRSwap('Pay', '10y', 'USD')
+    other_swap = OtherIRSwap('Pay', '10y', 'USD')
+
+    def get_results(provider, value):
+        def impl(ids_to_requests, timeout=None):
+            return {r: provider._handle_results(r, [[[{'$type': 'Risk', 'val': value}]]])
+                    for r in ids_to_requests.values()}
+
+        return impl
+
+    with mock.patch.object(GsRiskApi, 'calc_multi', return_value=('id',)), \
+            mock.patch.object(OtherRiskApi, 'calc_multi', return_value=('other_id',)), \
+            mock.patch.object(GsRiskApi, 'get_results', side_effect=get_results(GsRiskApi, 0.01)) as mocker, \
+            mock.patch.object(OtherRiskApi, 'get_results', side_effect=get_results(OtherRiskApi, 0.02)) as other_mocker:
+        for is_async in (False, True):
+            with PricingContext(is_batch=True, is_async=is_async):
+                price_f = swap.price()
+                other_price_f = other_swap.price()
+
+            assert price_f.result(timeout=10) == 0.01
+            assert other_price_f.result(timeout=10) == 0.02
+
+        assert mocker.call_count == 2
+        assert other_mocker.call_count == 2
+        assert tuple(mocker.call_args[0][0].keys()) == ('id',)
+        assert tuple(other_mocker.call_args[0][0].keys()) == ('other_id',)
+
+
+def test_multiple_providers_failure():
+    set_session()
+
+    swap = IRSwap('Pay', '10y', 'USD')
+    other_swap = OtherIRSwap('Pay', '10y', 'USD')
+    error = RuntimeError('Failed')
+
+    with mock.patch.object(GsRiskApi, '_exec') as mocker, \
+            mock.patch.object(OtherRiskApi, 'calc_multi', side_effect=error):
+        mocker.return_value = [[[[{'$type': 'Risk', 'val': 0.01}]]]]
+
+        with PricingContext():
+            price_f = swap.price()
+            other_price_f = other_swap.price()
+
+    assert price_f.result() == 0.01
+    assert other_price_f.result() is error
+
+
+def test_multiple_providers_from_pool_thread():
+    set_session()
+
+    session = GsSession.current
+    barrier = threading.Barrier(REQUEST_POOL_MAX_WORKERS)
+
+    def calc():
+        # Occupy every worker, so that any request submitted to the pool could never run
+        barrier.wait(timeout=10)
+
+        with session:
+            with PricingContext():
+                price_f = IRSwap('Pay', '10y', 'USD').price()
+                other_price_f = OtherIRSwap('Pay', '10y', 'USD').price()
+
+        return price_f.result(), other_price_f.result()
+
+    with mock.patch.object(GsRiskApi, '_exec') as mocker, mock.patch.object(OtherRiskApi, '_exec') as other_mocker:
+        mocker.return_value = [[[[{'$type': 'Risk', 'val': 0.01}]]]]
+        other_mocker.return_value = [[[[{'$type': 'Risk', 'val': 0.02}]]]]
+
+        futures = [_submit_request(calc) for _ in range(REQUEST_POOL_MAX_WORKERS)]
+        assert all(f.result(timeout=10) == (0.01, 0.02) for f in futures)
+
+
+@mock.patch.object(GsRiskApi, '_exec')
+def test_shared_context_multiple_threads(mocker):
+    set_session()
+
+    mocker.return_value = [[[[{'$type': 'Risk', 'val': 0.01}]]]]
+    session = GsSession.current
+    pc = PricingContext()
+    barrier = threading.Barrier(2)
+
+    def calc(_):
+        with session:
+            with pc:
+                # Make sure both threads have entered before either exits
+                barrier.wait(timeout=10)
+                price_f = IRSwap('Pay', '10y', 'USD').price()
+                barrier.wait(timeout=10)
+
+            assert PricingContext.current.active_context is PricingContext.current
+            return price_f.result(timeout=10)
+
+    with ThreadPoolExecutor(2) as pool:
+        results = tuple(pool.map(calc, range(2)))
+
+    assert results == (0.01, 0.01)
+
+
+def test_uninitialised_current_session():
+    set_session()
+
+    session = GsSession.get(Environment.QA, 'client_id', 'secret')
+    assert session._session is None
+
+    def init(self):
+        self._session = mock.MagicMock()
+
+    def exec_(_requests):
+        assert GsSession.current._session is not None
+        return [[[[{'$type': 'Risk', 'val': 0.01}]]]]
+
+    with mock.patch.object(OAuth2Session, 'init', init), mock.patch.object(GsRiskApi, '_exec', side_effect=exec_):
+        GsSession.current = session
+
+        with PricingContext():
+            price_f = IRSwap('Pay', '10y', 'USD').dollar_price()
+
+    assert price_f.result() == 0.01
+
+
 def test_resolution():
     set_session()
 
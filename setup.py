@@ -56,6 +56,7 @@ setuptools.setup(
         "backoff",
         "cachetools",
         "configparser",
+        "contextvars;python_version<'3.7'",
         "dataclasses;python_version<'3.7'",
         "funcsigs",
         "future",